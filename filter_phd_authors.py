@@ -1,28 +1,83 @@
 import pandas as pd
-import requests
+import aiohttp
+import argparse
+import asyncio
 import sys
-import time
-import json
-import warnings
-from urllib3.exceptions import InsecureRequestWarning
+import os
+import orjson
+import urllib.parse
+from aiolimiter import AsyncLimiter
 
-# Suppress only the InsecureRequestWarning from urllib3
-warnings.simplefilter('ignore', InsecureRequestWarning)
+from lookup_cache import DEFAULT_CACHE_FILE, LookupCache
+from sequence_utils import first_countries, starts_in_france
+
+# Contact address sent to OpenAlex so requests land in the "polite pool"
+MAILTO = os.environ.get('OPENALEX_MAILTO')
+
+# Number of authors checked concurrently, and how many are scheduled at once
+CONCURRENCY = 8
+BATCH_SIZE = 500
+
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=10)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Leaky-bucket rate limiters, one per API
+OPENALEX_LIMITER = AsyncLimiter(max_rate=10 if MAILTO else 8, time_period=1)  # polite pool allows 10 req/sec
+THESES_LIMITER = AsyncLimiter(max_rate=5, time_period=1)    # 5 req/sec for theses.fr
+
+def create_session():
+    """
+    Builds a shared HTTP session so connections to OpenAlex and theses.fr are
+    kept alive and reused instead of paying a new TCP+TLS handshake per request.
+    """
+    connector = aiohttp.TCPConnector(limit=32, limit_per_host=CONCURRENCY, ttl_dns_cache=300)
+
+    user_agent = 'FRUSA-OpenAlex/1.0'
+    if MAILTO:
+        user_agent += f' (mailto:{MAILTO})'
+
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=REQUEST_TIMEOUT,
+        headers={'User-Agent': user_agent, 'Connection': 'keep-alive'}
+    )
+
+async def get_json(session, limiter, url, params=None, retries=3, **kwargs):
+    """
+    Fetches a JSON document under the given rate limiter, retrying with
+    exponential backoff on rate limiting and server errors.
+    """
+    for attempt in range(retries + 1):
+        async with limiter, session.get(url, params=params, **kwargs) as response:
+            if response.status in RETRY_STATUSES and attempt < retries:
+                await asyncio.sleep(0.3 * 2 ** attempt)
+                continue
+            response.raise_for_status()
+            return orjson.loads(await response.read())
+
+async def get_author_name(session, cache, author_id):
+    """Fetches an author's name from the cache, or else from the OpenAlex API."""
+    name = cache.author_name(author_id)
+    if name:
+        return name
 
-def get_author_name(author_id):
-    """Fetches an author's name from the OpenAlex API."""
     url = f"https://api.openalex.org/authors/{author_id}"
+    params = {'select': 'id,display_name'}
+    if MAILTO:
+        params['mailto'] = MAILTO
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json().get('display_name')
-    except requests.exceptions.RequestException:
+        data = await get_json(session, OPENALEX_LIMITER, url, params=params)
+        name = data.get('display_name')
+        if name:
+            cache.set_author_names({author_id: name})
+        return name
+    except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError):
         # Return None if there's any issue, will be skipped later
         return None
 
-def find_thesis_by_name(author_name):
+async def find_thesis_by_name(session, cache, author_name):
     """
-    Queries the theses.fr API and returns the URL and data if a match is found.
+    Queries the theses.fr API (or the cache) and returns the URL and data if a match is found.
     """
     if not author_name:
         return None, None, None
@@ -31,14 +86,15 @@ def find_thesis_by_name(author_name):
     params = {'q': author_name}
     
     # Prepare the URL for printing before the request is made
-    request = requests.Request('GET', search_url, params=params)
-    prepared_request = request.prepare()
-    request_url = prepared_request.url
+    request_url = f"{search_url}?{urllib.parse.urlencode(params)}"
 
     try:
-        response = requests.get(search_url, params=params, verify=False, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        cached = cache.thesis_search(author_name)
+        if cached is not None:
+            data = orjson.loads(cached)
+        else:
+            data = await get_json(session, THESES_LIMITER, search_url, params=params, ssl=False)
+            cache.set_thesis_searches({author_name: orjson.dumps(data).decode()})
         
         # A match is considered found if the 'personnes' list exists and is not empty
         if data.get('personnes'):
@@ -46,16 +102,70 @@ def find_thesis_by_name(author_name):
         else:
             return False, request_url, None
 
-    except (requests.exceptions.RequestException, json.JSONDecodeError):
+    except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError):
         return False, request_url, None
 
+async def check_author(session, semaphore, cache, author_id):
+    """
+    Looks up an author's name, then searches theses.fr for it.
+
+    Returns:
+        tuple: (author_id, request_url, results), results being None without a match.
+    """
+    async with semaphore:
+        author_name = await get_author_name(session, cache, author_id)
+        
+        if not author_name:
+            # Silently skip if name can't be fetched. Uncomment to debug.
+            # print(f"Skipping Author ID {author_id} (France-starter): Could not fetch name.", file=sys.stderr)
+            return author_id, None, None
+            
+        # Request rates are enforced per API by OPENALEX_LIMITER and THESES_LIMITER
+        has_match, url, results = await find_thesis_by_name(session, cache, author_name)
+
+        return author_id, url, (results if has_match else None)
+
+async def check_authors(author_ids, cache):
+    """
+    Checks all authors concurrently, bounded by CONCURRENCY, and prints every match.
+    Names and thesis searches are read from and added to the given LookupCache.
+
+    Returns:
+        int: The number of authors with a potential thesis match.
+    """
+    matches_found_count = 0
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async with create_session() as session:
+        for start in range(0, len(author_ids), BATCH_SIZE):
+            batch = author_ids[start:start + BATCH_SIZE]
+            checked = await asyncio.gather(*(check_author(session, semaphore, cache, author_id) for author_id in batch))
+
+            for author_id, url, results in checked:
+                if results is None:
+                    continue
+                matches_found_count += 1
+                print("\n" + "="*20 + " MATCH FOUND " + "="*20)
+                print(f"Author ID:   {author_id}")
+                print(f"Request URL: {url}")
+                print("API Results:")
+                print(orjson.dumps(results, option=orjson.OPT_INDENT_2).decode())
+                print("="*53 + "\n")
+
+    return matches_found_count
+
 def main():
     """
     Main function to read authors from a CSV, filter for those starting in France,
     and check if they have a thesis record.
     """
+    parser = argparse.ArgumentParser(description="Check French-starting authors for a theses.fr record")
+    parser.add_argument('--cache-file', default=DEFAULT_CACHE_FILE,
+                        help=f'SQLite cache of fetched names and thesis searches (default: {DEFAULT_CACHE_FILE})')
+    args = parser.parse_args()
+
     try:
-        df = pd.read_csv('author_sequences_final.py.csv')
+        df = pd.read_csv('author_sequences_final.py.csv', engine='pyarrow', dtype_backend='pyarrow')
     except FileNotFoundError:
         print("Error: 'author_sequences_final.py.csv' not found.", file=sys.stderr)
         print("Please run 'process_authors.py' first.", file=sys.stderr)
@@ -63,70 +173,32 @@ def main():
 
     print(f"Starting to process {len(df)} total authors from the input file...")
     
-    authors_to_check_count = 0
-    matches_found_count = 0
-    debug_prints = 0
-
     # To process a small sample for testing, uncomment the following line
     # df = df.head(500)
 
-    for index, row in df.iterrows():
-        # Check for both possible column names to be robust
-        country_sequence = row.get('country_sequence', row.get('country_codes_sequence', ''))
+    # Check for both possible column names to be robust
+    column = 'country_sequence' if 'country_sequence' in df.columns else 'country_codes_sequence'
+    sequences = df[column]
 
-        # Handle cases where the sequence might be missing or not a string
-        if not isinstance(country_sequence, str) or not country_sequence:
-            continue
-            
-        # Debugging: Print sequences that contain 'FR' to see why they aren't matching
-        if 'FR' in country_sequence and debug_prints < 10:
-            print(f"\n[DEBUG] Row {index}:")
-            print(f"  Raw country_sequence: '{country_sequence}'")
-
-        # Find the first non-empty country in the sequence. The separator is ' -> '.
-        countries = [c.strip() for c in country_sequence.split(' -> ')]
-        first_country = None
-        for country in countries:
-            # Handle different kinds of empty placeholders
-            country_lower = country.lower()
-            if country and country_lower != 'empty' and country_lower != '<empty>':
-                # A field can contain multiple countries like 'FR,GB'.
-                # We only care about the first one in that list for the first publication.
-                first_country = country.split(',')[0].strip()
-                break
-        
-        if 'FR' in country_sequence and debug_prints < 10:
-            print(f"  Detected first_country: '{first_country}'")
-            debug_prints += 1
-            
-        # Only proceed if the first valid country is 'FR'
-        if first_country != 'FR':
-            continue
+    # Debugging: Print sequences that contain 'FR' to see why they aren't matching
+    has_fr = sequences[sequences.str.contains('FR', regex=False, na=False)].head(10)
+    first_country = first_countries(has_fr)
+    for index in has_fr.index:
+        print(f"\n[DEBUG] Row {index}:")
+        print(f"  Raw country_sequence: '{sequences[index]}'")
+        print(f"  Detected first_country: '{first_country[index]}'")
+
+    # Only proceed if the first valid country is 'FR'
+    france_starters = df[starts_in_france(sequences)]
+    authors_to_check_count = len(france_starters)
+
+    # Names and thesis searches already fetched, shared across runs
+    cache = LookupCache(args.cache_file)
+    try:
+        matches_found_count = asyncio.run(check_authors(france_starters['author_id'].tolist(), cache))
+    finally:
+        cache.close()
 
-        authors_to_check_count += 1
-        author_id = row['author_id']
-        
-        author_name = get_author_name(author_id)
-        
-        if not author_name:
-            # Silently skip if name can't be fetched. Uncomment to debug.
-            # print(f"Skipping Author ID {author_id} (France-starter): Could not fetch name.", file=sys.stderr)
-            continue
-            
-        has_match, url, results = find_thesis_by_name(author_name)
-        
-        if has_match:
-            matches_found_count += 1
-            print("\n" + "="*20 + " MATCH FOUND " + "="*20)
-            print(f"Author ID:   {author_id}")
-            print(f"Request URL: {url}")
-            print("API Results:")
-            print(json.dumps(results, indent=2, ensure_ascii=False))
-            print("="*53 + "\n")
-        
-        # Be respectful to the APIs by adding a short delay
-        time.sleep(0.2)
-        
     print("\n" + "="*60)
     print("Processing Complete.")
     print(f"Filtered to {authors_to_check_count} authors whose first non-empty country was 'FR'.")
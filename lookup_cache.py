@@ -0,0 +1,93 @@
+"""
+Persistent SQLite cache for the OpenAlex and theses.fr lookups.
+
+Re-running the PhD detection (or resuming it after a crash) only queries the
+APIs for authors and names that were not fetched successfully before.
+"""
+
+import sqlite3
+from typing import Dict, Iterable, Optional
+
+DEFAULT_CACHE_FILE = 'phd_lookups.sqlite'
+
+def short_openalex_id(author_id) -> str:
+    """Strip the https://openalex.org/ prefix from an author id, if any."""
+    return str(author_id).rsplit('/', 1)[-1]
+
+class LookupCache:
+    """
+    Key/value store backed by two SQLite tables:
+    author_name(id, name) and thesis_search(name, data).
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_FILE):
+        """
+        Open (or create) the cache.
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS author_name (id TEXT PRIMARY KEY, name TEXT NOT NULL)'
+            )
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS thesis_search (name TEXT PRIMARY KEY, data TEXT NOT NULL)'
+            )
+
+    def _lookup(self, table: str, key: str, value: str, keys: Iterable[str]) -> Dict[str, str]:
+        """Join the given keys against a table and return the cached entries."""
+        with self.connection:
+            self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS wanted (key TEXT PRIMARY KEY)')
+            self.connection.execute('DELETE FROM wanted')
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO wanted VALUES (?)', ((k,) for k in keys)
+            )
+            rows = self.connection.execute(
+                f'SELECT w.key, t.{value} FROM wanted w LEFT JOIN {table} t ON t.{key} = w.key '
+                f'WHERE t.{value} IS NOT NULL'
+            ).fetchall()
+        return dict(rows)
+
+    def _store(self, table: str, key: str, value: str, entries: Dict[str, str]):
+        """Insert or update entries of a table."""
+        with self.connection:
+            self.connection.executemany(
+                f'INSERT INTO {table} ({key}, {value}) VALUES (?, ?) '
+                f'ON CONFLICT({key}) DO UPDATE SET {value} = excluded.{value}',
+                entries.items()
+            )
+
+    def author_names(self, author_ids: Iterable[str]) -> Dict[str, str]:
+        """Return the cached display names, keyed by short OpenAlex id."""
+        return self._lookup('author_name', 'id', 'name', (short_openalex_id(a) for a in author_ids))
+
+    def author_name(self, author_id: str) -> Optional[str]:
+        """Return the cached display name of a single author, if any."""
+        row = self.connection.execute(
+            'SELECT name FROM author_name WHERE id = ?', (short_openalex_id(author_id),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_author_names(self, names: Dict[str, str]):
+        """Store display names keyed by OpenAlex id."""
+        self._store('author_name', 'id', 'name', {short_openalex_id(a): n for a, n in names.items()})
+
+    def thesis_searches(self, names: Iterable[str]) -> Dict[str, str]:
+        """Return the cached theses.fr JSON responses, keyed by searched name."""
+        return self._lookup('thesis_search', 'name', 'data', names)
+
+    def thesis_search(self, name: str) -> Optional[str]:
+        """Return the cached theses.fr JSON response for a single name, if any."""
+        row = self.connection.execute(
+            'SELECT data FROM thesis_search WHERE name = ?', (name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_thesis_searches(self, searches: Dict[str, str]):
+        """Store theses.fr JSON responses keyed by searched name."""
+        self._store('thesis_search', 'name', 'data', searches)
+
+    def close(self):
+        self.connection.close()
@@ -8,20 +8,30 @@ Includes minet's native browser cookie extraction and user agent spoofing.
 Features intelligent rate limiting to respect API limits (9 req/sec for OpenAlex).
 """
 
+import numpy as np
 import pandas as pd
-import json
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import orjson
+import os
 import sys
 import logging
+import hashlib
 from pathlib import Path
 import argparse
-import subprocess
 import urllib.parse
 import tempfile
-import os
-import time
-import threading
+from multiprocessing import Pool
+from itertools import islice
 from typing import Optional
 
+from minet.cookies import get_cookie_resolver_from_browser
+from minet.executors import HTTPThreadPoolExecutor
+
+from lookup_cache import DEFAULT_CACHE_FILE, LookupCache, short_openalex_id
+from sequence_utils import starts_in_france
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -29,379 +39,420 @@ logger = logging.getLogger(__name__)
 # Global flag for browser authentication
 USE_BROWSER_AUTH = True
 
-class TokenBucketRateLimiter:
+# Contact address sent to OpenAlex so requests land in the "polite pool"
+MAILTO = os.environ.get('OPENALEX_MAILTO')
+
+# Directory where fetched response bodies are stored
+DOWNLOAD_DIR = Path('downloaded')
+
+# Rows read at once when streaming intermediate files
+CHUNK_SIZE = 10_000
+
+# Processes used to decode downloaded bodies in parallel
+PARSE_WORKERS = os.cpu_count() or 1
+
+# Intermediate files are written as zstd-compressed Parquet
+PARQUET_COMPRESSION = 'zstd'
+
+# Per-author flags written by prepare_author_urls
+AUTHORS_COLUMNS = ['author_id', 'started_in_france', 'ever_in_france', 'country_sequence']
+
+# The same authors once their name is fetched
+NAMES_SCHEMA = pa.schema([
+    ('author_id', pa.string()),
+    ('display_name', pa.string()),
+    ('started_in_france', pa.bool_()),
+    ('ever_in_france', pa.bool_()),
+    ('country_sequence', pa.string())
+])
+
+# Columns of the final CSV, the authors with their thesis verdict
+RESULTS_SCHEMA = (NAMES_SCHEMA
+                  .append(pa.field('has_potential_thesis', pa.bool_()))
+                  .append(pa.field('thesis_confidence', pa.string()))
+                  .append(pa.field('thesis_details', pa.string())))
+
+# Per-name thesis verdict columns, joined back onto the authors
+VERDICT_COLUMNS = ['display_name', 'searched', 'has_potential_thesis', 'thesis_confidence', 'thesis_details']
+
+# Per-API thread caps and default throttles (seconds between requests):
+# 8.5 req/sec on OpenAlex, 10 in its polite pool, and 5 req/sec on theses.fr
+MAX_PER_DOMAIN = {'openalex': 8, 'theses': 5}
+DEFAULT_THROTTLE = {'openalex': 0.12, 'theses': 0.2}
+POLITE_THROTTLE = 0.1
+
+THESES_SEARCH_URL = 'https://theses.fr/api/v1/personnes/recherche/?q='
+
+# theses.fr roles marking a person as the author of a thesis
+AUTHOR_ROLES = frozenset({'Auteur / Autrice'})
+
+# OpenAlex accepts up to 50 OR-separated ids in a single filter
+OPENALEX_BATCH_SIZE = 50
+
+def iter_parquet(path: str, columns: list):
+    """Stream a Parquet file as DataFrames of CHUNK_SIZE rows, reading only the given columns."""
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=CHUNK_SIZE, columns=columns):
+        yield batch.to_pandas()
+
+def downloaded_files() -> set:
+    """List downloaded bodies once, so missing files are skipped without a stat per row."""
+    if not DOWNLOAD_DIR.exists():
+        return set()
+    with os.scandir(DOWNLOAD_DIR) as entries:
+        return {entry.name for entry in entries}
+
+def map_chunks(frame: pd.DataFrame, worker) -> list:
     """
-    Token bucket rate limiter for API requests.
-    Allows bursts up to bucket capacity while maintaining average rate.
+    Split a DataFrame into one Parquet file per process and map a worker over them.
+
+    Workers receive the path of their chunk rather than the rows themselves, so
+    large frames are not pickled through the pool.
     """
+    if frame.empty:
+        return []
     
-    def __init__(self, rate: float, capacity: Optional[float] = None):
-        """
-        Initialize the rate limiter.
-        
-        Args:
-            rate: Tokens per second (e.g., 8.5 for 8.5 requests/second)
-            capacity: Maximum tokens in bucket (defaults to rate)
-        """
-        self.rate = rate
-        self.capacity = capacity or rate
-        self.tokens = self.capacity
-        self.last_update = time.time()
-        self.lock = threading.Lock()
-        
-    def acquire(self, tokens: int = 1) -> bool:
-        """
-        Try to acquire tokens. Returns True if successful, False otherwise.
-        """
-        with self.lock:
-            now = time.time()
-            # Add tokens based on elapsed time
-            elapsed = now - self.last_update
-            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
-            self.last_update = now
-            
-            if self.tokens >= tokens:
-                self.tokens -= tokens
-                return True
-            return False
-    
-    def wait_for_token(self, tokens: int = 1):
-        """
-        Wait until we can acquire the required tokens.
-        """
-        while not self.acquire(tokens):
-            # Calculate how long to wait
-            with self.lock:
-                tokens_needed = tokens - self.tokens
-                wait_time = tokens_needed / self.rate
-            
-            # Add a small buffer to avoid busy waiting
-            time.sleep(min(wait_time + 0.01, 0.1))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        chunk_paths = []
+        for i, rows in enumerate(np.array_split(np.arange(len(frame)), PARSE_WORKERS)):
+            if len(rows):
+                chunk_path = os.path.join(tmp_dir, f'chunk_{i}.parquet')
+                frame.iloc[rows].to_parquet(chunk_path, index=False)
+                chunk_paths.append(chunk_path)
+        
+        with Pool(min(PARSE_WORKERS, len(chunk_paths))) as pool:
+            return list(pool.imap_unordered(worker, chunk_paths))
+
+def read_downloaded(path: Optional[str]) -> Optional[dict]:
+    """Decode a downloaded JSON body, or return None if there is none or it is unreadable."""
+    if path is None:
+        return None
+    try:
+        return orjson.loads((DOWNLOAD_DIR / path).read_bytes())
+    except (orjson.JSONDecodeError, OSError):
+        return None
 
-# Global rate limiters for different APIs
-OPENALEX_LIMITER = TokenBucketRateLimiter(rate=8.5, capacity=10)  # 8.5 req/sec, allow small bursts
-THESES_LIMITER = TokenBucketRateLimiter(rate=5.0, capacity=8)     # 5 req/sec for theses.fr
+def prepare_author_urls(input_file: str, output_file: str, authors_output: str, cache: LookupCache,
+                        filter_france: bool = False) -> int:
+    """
+    Prepare batched OpenAlex author URLs for minet processing.
 
-def prepare_author_urls(input_file: str, output_file: str, filter_france: bool = False) -> int:
-    """Prepare OpenAlex author URLs for minet processing."""
+    Each URL fetches up to OPENALEX_BATCH_SIZE authors at once, skipping the
+    authors whose name is already cached. The per-author flags are written to
+    authors_output so they can be joined back onto the fetched names.
+    """
     try:
         logger.info(f"Reading author data from {input_file}")
-        df = pd.read_csv(input_file)
+        df = pd.read_csv(input_file, engine='pyarrow', dtype_backend='pyarrow')
+        sequences = df.get('country_codes_sequence', pd.Series('', index=df.index))
         
-        authors_to_process = []
-        france_count = 0
+        # Compute flags for all authors at once
+        authors = pd.DataFrame({
+            'author_id': df['author_id'],
+            'started_in_france': starts_in_france(sequences),
+            'ever_in_france': sequences.str.contains('FR', regex=False, na=False),
+            'country_sequence': sequences
+        })
+        france_count = int(authors['started_in_france'].sum())
         
-        for _, row in df.iterrows():
-            author_id = row['author_id']
-            country_seq = row.get('country_codes_sequence', '')
-            
-            # Compute flags
-            started_in_france = False
-            ever_in_france = False
-            if isinstance(country_seq, str) and country_seq:
-                # Normalize sequence and check for FR anywhere
-                if 'FR' in country_seq.split(',') or 'FR' in country_seq:
-                    ever_in_france = True
-                
-                countries = [c.strip() for c in country_seq.split(' -> ')]
-                first_country = None
-                for country in countries:
-                    if country and country.lower() not in ['empty', '<empty>']:
-                        first_country = country.split(',')[0].strip()
-                        break
-                if first_country == 'FR':
-                    started_in_france = True
-                    france_count += 1
-            
-            # Add to processing list
-            if not filter_france or started_in_france:
-                authors_to_process.append({
-                    'author_id': author_id,
-                    'url': f"https://api.openalex.org/authors/{author_id}",
-                    'started_in_france': started_in_france,
-                    'ever_in_france': ever_in_france,
-                    'country_sequence': country_seq
-                })
+        if filter_france:
+            authors = authors[authors['started_in_france']]
         
         logger.info(f"Authors starting in France: {france_count}")
-        logger.info(f"Total to process: {len(authors_to_process)}")
+        logger.info(f"Total to process: {len(authors)}")
         
-        pd.DataFrame(authors_to_process).to_csv(output_file, index=False)
-        return len(authors_to_process)
+        authors.to_parquet(authors_output, compression=PARQUET_COMPRESSION, index=False)
         
-    except Exception as e:
-        logger.error(f"Error preparing URLs: {e}")
-        return 0
-
-def fetch_with_minet(urls_file: str, output_file: str, rate_limit: int = 50) -> bool:
-    """Use minet to fetch URLs in parallel with rate limiting for OpenAlex."""
-    try:
-        # Calculate throttle to stay under 8.5 req/sec with safety margin
-        # With 8 threads, each thread should wait ~1.0 second between requests
-        throttle_time = 1.0  # 1 second between requests per thread
+        # Only fetch the authors missing from the cache
+        all_ids = authors['author_id'].map(short_openalex_id)
+        cached = cache.author_names(all_ids)
+        logger.info(f"Names already cached: {len(cached)}")
         
-        cmd = [
-            'minet', 'fetch', 'url',
-            '-i', urls_file,
-            '-o', output_file,
-            '--throttle', str(throttle_time),  # 1 second throttle for safety
-            '--threads', '8',  # Reduced threads to respect rate limits
-            '--domain-parallelism', '1',  # Must be 1 when using throttle
-            '--timeout', '30',
-            '--retries', '3'
-        ]
+        # Only request the fields we use, and identify ourselves for the polite pool
+        query = f"&per-page={OPENALEX_BATCH_SIZE}&select=id,display_name"
+        if MAILTO:
+            query += f"&mailto={urllib.parse.quote(MAILTO)}"
         
-        # Add browser authentication if enabled
-        if USE_BROWSER_AUTH:
-            cmd.extend([
-                '-g', 'firefox',  # Grab cookies from Firefox
-                '--spoof-user-agent'  # Use realistic user agent
-            ])
-        else:
-            # Even without cookies, spoof user agent to appear like a real browser
-            cmd.append('--spoof-user-agent')
+        # Group ids into batches, one OpenAlex filter query per batch
+        ids = iter(all_ids[~all_ids.isin(cached.keys())])
+        batches = []
+        while batch := list(islice(ids, OPENALEX_BATCH_SIZE)):
+            batches.append('|'.join(batch))
         
-        auth_status = "with browser auth" if USE_BROWSER_AUTH else "with user agent spoofing only"
-        logger.info(f"Running minet fetch {auth_status} (8.5 req/sec limit): {' '.join(cmd)}")
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        logger.info(f"Batched into {len(batches)} OpenAlex requests")
+        
+        pd.DataFrame({
+            'author_ids': batches,
+            'url': [f"https://api.openalex.org/authors?filter=openalex_id:{batch}{query}" for batch in batches]
+        }, dtype=object).to_parquet(output_file, compression=PARQUET_COMPRESSION, index=False)
+        return len(authors)
         
-        if result.returncode == 0:
-            logger.info("Minet fetch completed successfully")
-            return True
-        else:
-            logger.error(f"Minet failed: {result.stderr}")
-            return False
-            
     except Exception as e:
-        logger.error(f"Error running minet: {e}")
-        return False
+        logger.error(f"Error preparing URLs: {e}")
+        return 0
+
+def minet_fetch(urls_file: str, output_file: str, threads: int, throttle: float,
+                domain_parallelism: int = 1, insecure: bool = False) -> None:
+    """
+    Fetch every URL of urls_file in-process with minet's HTTP thread pool.
+
+    Mirrors `minet fetch url`: bodies are saved under downloaded/ and a report
+    holding the input columns plus http_status, fetch_error and path is
+    streamed to the output_file Parquet file as results come in. Rows with an
+    empty url are passed through without being fetched.
+    """
+    get_cookie = get_cookie_resolver_from_browser('firefox') if USE_BROWSER_AUTH else None
 
-def fetch_with_minet_custom(urls_file: str, output_file: str, threads: int, domain_parallelism: int, throttle: float) -> bool:
-    """Use minet to fetch URLs in parallel with custom performance settings and rate limiting."""
+    def request_args(payload):
+        return {
+            'cookie': get_cookie(payload.url) if get_cookie else None,
+            'spoof_ua': True
+        }
+
+    DOWNLOAD_DIR.mkdir(exist_ok=True)
+
+    urls = pq.ParquetFile(urls_file)
+    schema = (urls.schema_arrow
+              .append(pa.field('http_status', pa.int32()))
+              .append(pa.field('fetch_error', pa.string()))
+              .append(pa.field('path', pa.string())))
+
+    def rows():
+        for batch in urls.iter_batches(batch_size=CHUNK_SIZE):
+            yield from batch.to_pylist()
+
+    executor = HTTPThreadPoolExecutor(
+        max_workers=threads,
+        insecure=insecure,
+        timeout=30,
+        retry=True,
+        retryer_kwargs={'retry_on_timeout': True, 'max_attempts': 4}
+    )
+    with executor, pq.ParquetWriter(output_file, schema, compression=PARQUET_COMPRESSION) as writer:
+        results = executor.request(
+            rows(),
+            key=lambda row: row['url'] or None,
+            passthrough=True,
+            throttle=throttle,
+            domain_parallelism=domain_parallelism,
+            request_args=request_args
+        )
+        report = []
+        for result in results:
+            http_status, fetch_error, path = None, None, None
+            if result.error is not None:
+                fetch_error = result.error_code
+            elif result.response is not None:
+                http_status = result.response.status
+                path = hashlib.md5(result.url.encode('utf-8')).hexdigest() + '.json'
+                (DOWNLOAD_DIR / path).write_bytes(result.response.body)
+            report.append({**result.item, 'http_status': http_status, 'fetch_error': fetch_error, 'path': path})
+
+            if len(report) >= CHUNK_SIZE:
+                writer.write_table(pa.Table.from_pylist(report, schema=schema))
+                report = []
+
+        if report:
+            writer.write_table(pa.Table.from_pylist(report, schema=schema))
+
+def fetch(urls_file: str, output_file: str, *, threads: int, throttle: Optional[float] = None,
+          domain_parallelism: int = 1, insecure: bool = False, domain: str = 'openalex') -> bool:
+    """
+    Fetch urls_file with minet, capping threads and defaulting the throttle per API.
+
+    Args:
+        threads: Requested number of threads, reduced to MAX_PER_DOMAIN[domain]
+        throttle: Seconds between requests, None or 0 meaning the domain default
+        domain_parallelism: Requests allowed in parallel on a domain, at most 1
+        insecure: Skip SSL certificate verification
+        domain: Either 'openalex' or 'theses'
+    """
     try:
-        # Override aggressive settings to respect rate limits
-        if throttle == 0.0:
-            # If no throttle specified, calculate safe throttle for OpenAlex
-            safe_throttle = max(0.12, 1.0 / 8.5)  # At least 0.12s between requests (8.5 req/sec)
-            logger.info(f"Auto-adjusting throttle from 0 to {safe_throttle:.2f}s to respect rate limits")
-            throttle = safe_throttle
+        if not throttle:
+            # The polite pool (with mailto) allows 10 req/sec on OpenAlex
+            throttle = POLITE_THROTTLE if domain == 'openalex' and MAILTO else DEFAULT_THROTTLE[domain]
+            logger.info(f"Using the default throttle of {throttle}s for {domain}")
         
         # Limit threads to avoid overwhelming APIs
-        if threads > 8:
-            logger.info(f"Reducing threads from {threads} to 8 to respect rate limits")
-            threads = 8
+        if threads > MAX_PER_DOMAIN[domain]:
+            logger.info(f"Reducing threads from {threads} to {MAX_PER_DOMAIN[domain]} for {domain}")
+            threads = MAX_PER_DOMAIN[domain]
         
         # If throttle > 0, we must set domain-parallelism to 1 due to minet restrictions
-        actual_domain_parallelism = 1 if throttle > 0 else min(domain_parallelism, 1)
-        
-        cmd = [
-            'minet', 'fetch', 'url',
-            '-i', urls_file,
-            '-o', output_file,
-            '--throttle', str(throttle),
-            '--threads', str(threads),
-            '--domain-parallelism', str(actual_domain_parallelism),
-            '--timeout', '30',
-            '--retries', '3'
-        ]
-        
-        # Add browser authentication if enabled
-        if USE_BROWSER_AUTH:
-            cmd.extend([
-                '-g', 'firefox',  # Grab cookies from Firefox
-                '--spoof-user-agent'  # Use realistic user agent
-            ])
-        else:
-            # Even without cookies, spoof user agent to appear like a real browser
-            cmd.append('--spoof-user-agent')
-        
-        logger.info(f"Using throttle {throttle}s with {threads} threads (respects 8.5 req/sec limit)")
+        domain_parallelism = 1 if throttle > 0 else min(domain_parallelism, 1)
         
         auth_status = "with browser auth" if USE_BROWSER_AUTH else "with user agent spoofing only"
-        logger.info(f"Running minet fetch {auth_status}: {' '.join(cmd)}")
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        logger.info(f"Running minet fetch on {domain} {auth_status}, throttle {throttle}s with {threads} threads")
+        minet_fetch(urls_file, output_file, threads=threads, throttle=throttle,
+                    domain_parallelism=domain_parallelism, insecure=insecure)
         
-        if result.returncode == 0:
-            logger.info("Minet fetch completed successfully")
-            return True
-        else:
-            logger.error(f"Minet failed: {result.stderr}")
-            return False
+        logger.info(f"Minet fetch on {domain} completed successfully")
+        return True
             
     except Exception as e:
-        logger.error(f"Error running minet: {e}")
+        logger.error(f"Error running minet on {domain}: {e}")
         return False
 
-def fetch_thesis_with_minet(urls_file: str, output_file: str) -> bool:
-    """Use minet to fetch theses.fr URLs with conservative rate limiting."""
-    try:
-        # Conservative settings for theses.fr
-        throttle_time = 0.2  # 5 req/sec max
-        
-        cmd = [
-            'minet', 'fetch', 'url',
-            '-i', urls_file,
-            '-o', output_file,
-            '--throttle', str(throttle_time),  # Conservative throttle
-            '--threads', '5',  # Reduced threads for theses.fr
-            '--domain-parallelism', '1',  # Must be 1 when using throttle
-            '--timeout', '30',
-            '--retries', '3',
-            '--insecure'  # theses.fr has SSL issues
-        ]
-        
-        # Add browser authentication if enabled
-        if USE_BROWSER_AUTH:
-            cmd.extend([
-                '-g', 'firefox',  # Grab cookies from Firefox
-                '--spoof-user-agent'  # Use realistic user agent
-            ])
-        else:
-            # Even without cookies, spoof user agent to appear like a real browser
-            cmd.append('--spoof-user-agent')
-        
-        auth_status = "with browser auth" if USE_BROWSER_AUTH else "with user agent spoofing only"
-        logger.info(f"Running minet thesis search {auth_status} (5 req/sec limit): {' '.join(cmd)}")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            logger.info("Minet thesis search completed successfully")
-            return True
-        else:
-            logger.error(f"Minet thesis search failed: {result.stderr}")
-            return False
-            
-    except Exception as e:
-        logger.error(f"Error running minet thesis search: {e}")
-        return False
+def parse_author_names(chunk_path: str) -> pd.DataFrame:
+    """Decode the batched OpenAlex responses listed in a chunk file into (author_id, display_name) rows."""
+    rows = []
+    for path in pd.read_parquet(chunk_path)['path']:
+        data = read_downloaded(path)
+        if data is None:
+            continue
+        
+        for author in data.get('results', []):
+            name = author.get('display_name')
+            if name and author.get('id'):
+                rows.append((short_openalex_id(author['id']), name))
+    
+    return pd.DataFrame(rows, columns=['author_id', 'display_name'])
 
-def fetch_thesis_with_minet_custom(urls_file: str, output_file: str, threads: int, domain_parallelism: int, throttle: float) -> bool:
-    """Use minet to fetch theses.fr URLs with custom performance settings and rate limiting."""
-    try:
-        # Override aggressive settings for theses.fr
-        if throttle == 0.0:
-            # Conservative throttle for theses.fr
-            safe_throttle = 0.2  # 5 req/sec
-            logger.info(f"Auto-adjusting throttle from 0 to {safe_throttle}s for theses.fr")
-            throttle = safe_throttle
-        
-        # Limit threads for theses.fr
-        if threads > 5:
-            logger.info(f"Reducing threads from {threads} to 5 for theses.fr")
-            threads = 5
-        
-        # If throttle > 0, we must set domain-parallelism to 1 due to minet restrictions
-        actual_domain_parallelism = 1 if throttle > 0 else min(domain_parallelism, 1)
-        
-        cmd = [
-            'minet', 'fetch', 'url',
-            '-i', urls_file,
-            '-o', output_file,
-            '--throttle', str(throttle),
-            '--threads', str(threads),
-            '--domain-parallelism', str(actual_domain_parallelism),
-            '--timeout', '30',
-            '--retries', '3',
-            '--insecure'  # theses.fr has SSL issues
-        ]
-        
-        # Add browser authentication if enabled
-        if USE_BROWSER_AUTH:
-            cmd.extend([
-                '-g', 'firefox',  # Grab cookies from Firefox
-                '--spoof-user-agent'  # Use realistic user agent
-            ])
-        else:
-            # Even without cookies, spoof user agent to appear like a real browser
-            cmd.append('--spoof-user-agent')
-        
-        logger.info(f"Using throttle {throttle}s with {threads} threads for theses.fr")
-        
-        auth_status = "with browser auth" if USE_BROWSER_AUTH else "with user agent spoofing only"
-        logger.info(f"Running minet thesis search {auth_status}: {' '.join(cmd)}")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            logger.info("Minet thesis search completed successfully")
-            return True
-        else:
-            logger.error(f"Minet thesis search failed: {result.stderr}")
-            return False
-            
-    except Exception as e:
-        logger.error(f"Error running minet thesis search: {e}")
-        return False
+def extract_author_names(minet_output: str, authors_file: str, names_output: str,
+                         thesis_urls_output: str, cache: LookupCache) -> int:
+    """
+    Extract author names from batched minet results, cache them and join the
+    cached names back onto the authors.
 
-def extract_author_names(minet_output: str, names_output: str) -> int:
-    """Extract author names from minet results."""
+    The theses.fr search URLs are prepared in the same pass, one per distinct
+    author name: authors sharing a display name are searched once, their
+    results are joined back in analyze_thesis_results. The url is left empty
+    for names whose search is cached.
+    """
     try:
-        df = pd.read_csv(minet_output)
-        successful = df[df['http_status'] == 200].copy()  # Use http_status instead of status
+        existing = downloaded_files()
+        report = pd.read_parquet(minet_output, columns=['http_status', 'path'])
+        successful = report[(report['http_status'] == 200) & report['path'].isin(existing)]  # Use http_status instead of status
+        
+        # Decode downloaded JSON files on all cores
+        parsed = map_chunks(successful[['path']], parse_author_names)
+        for names in parsed:
+            cache.set_author_names(dict(zip(names['author_id'], names['display_name'])))
+        
+        extracted = 0
+        unique_names = {}
+        with pq.ParquetWriter(names_output, NAMES_SCHEMA, compression=PARQUET_COMPRESSION) as writer:
+            for authors in iter_parquet(authors_file, AUTHORS_COLUMNS):
+                ids = authors['author_id'].map(short_openalex_id)
+                authors['display_name'] = ids.map(cache.author_names(ids))
+                author_names = authors.dropna(subset=['display_name'])
+                
+                writer.write_table(pa.Table.from_pandas(author_names, schema=NAMES_SCHEMA, preserve_index=False))
+                extracted += len(author_names)
+                unique_names.update(dict.fromkeys(author_names['display_name']))
         
-        author_names = []
-        for _, row in successful.iterrows():
-            try:
-                # Read from downloaded JSON file
-                json_path = Path('downloaded') / row['path']
-                if json_path.exists():
-                    with open(json_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    name = data.get('display_name')
-                    if name:
-                        author_names.append({
-                            'author_id': row['author_id'],
-                            'display_name': name,
-                            'started_in_france': row['started_in_france'],
-                            'ever_in_france': row.get('ever_in_france', False),
-                            'country_sequence': row['country_sequence']
-                        })
-            except (json.JSONDecodeError, KeyError, FileNotFoundError):
-                continue
+        logger.info(f"Extracted {extracted} names")
         
-        pd.DataFrame(author_names).to_csv(names_output, index=False)
-        logger.info(f"Extracted {len(author_names)} names")
-        return len(author_names)
+        cached = cache.thesis_searches(unique_names)
+        logger.info(f"Distinct names: {len(unique_names)} (from {extracted} authors), already cached: {len(cached)}")
         
-    except Exception as e:
-        logger.error(f"Error extracting names: {e}")
-        return 0
-
-def prepare_thesis_urls(names_file: str, urls_output: str) -> int:
-    """Prepare theses.fr search URLs."""
-    try:
-        df = pd.read_csv(names_file)
-        search_urls = []
+        # Names are already distinct, so quote_plus runs once per name
+        names = pd.Series(list(unique_names), dtype=object)
+        to_search = ~names.isin(cached.keys())
+        urls = pd.Series('', index=names.index, dtype=object)
+        urls[to_search] = THESES_SEARCH_URL + names[to_search].map(urllib.parse.quote_plus)
         
-        for _, row in df.iterrows():
-            name = row['display_name']
-            if name:
-                encoded_name = urllib.parse.quote_plus(name)
-                url = f"https://theses.fr/api/v1/personnes/recherche/?q={encoded_name}"
-                search_urls.append({
-                    'author_id': row['author_id'],
-                    'display_name': name,
-                    'url': url,
-                    'started_in_france': row['started_in_france'],
-                    'ever_in_france': row.get('ever_in_france', False),
-                    'country_sequence': row['country_sequence']
-                })
-        
-        pd.DataFrame(search_urls).to_csv(urls_output, index=False)
+        search_urls = pd.DataFrame({'display_name': names, 'url': urls})
+        search_urls.to_parquet(thesis_urls_output, compression=PARQUET_COMPRESSION, index=False)
         logger.info(f"Prepared {len(search_urls)} thesis search URLs")
-        return len(search_urls)
+        return extracted
         
     except Exception as e:
-        logger.error(f"Error preparing thesis URLs: {e}")
+        logger.error(f"Error extracting names: {e}")
         return 0
 
-def analyze_thesis_results(results_file: str, final_output: str) -> dict:
-    """Analyze thesis search results and create final classification."""
+def classify_thesis_search(data: Optional[dict]) -> tuple:
+    """
+    Derive the thesis verdict of a name from its theses.fr search response.
+
+    Returns:
+        tuple: (has_potential_thesis, thesis_confidence, thesis_details)
+    """
+    personnes = data.get('personnes', []) if data is not None else []
+    
+    if not personnes:
+        return False, 'none', None
+    
+    # Check for author role (high confidence)
+    for person in personnes:
+        if AUTHOR_ROLES.isdisjoint(person.get('roles') or {}):
+            continue
+        return True, 'high', orjson.dumps({
+            'name': f"{person.get('prenom', '')} {person.get('nom', '')}".strip(),
+            'idref': person.get('id'),
+            'thesis_id': person.get('these'),
+            'disciplines': person.get('disciplines', []),
+            'establishments': person.get('etablissements', [])
+        }).decode()
+    
+    return True, 'medium', None
+
+def verdict_frame(names: list, searched, verdicts: list, **extra) -> pd.DataFrame:
+    """
+    Build the verdict rows of the given names column-wise, from their
+    classify_thesis_search tuples, with any extra columns appended.
+    """
+    has_thesis, confidence, details = zip(*verdicts) if verdicts else ((), (), ())
+    index = pd.RangeIndex(len(names))
+    return pd.DataFrame({
+        'display_name': pd.Series(names, index=index, dtype=object),
+        'searched': pd.Series(searched, index=index, dtype=bool),
+        'has_potential_thesis': pd.Series(has_thesis, index=index, dtype=bool),
+        'thesis_confidence': pd.Series(confidence, index=index, dtype=object),
+        'thesis_details': pd.Series(details, index=index, dtype=object),
+        **{column: pd.Series(values, index=index, dtype=object) for column, values in extra.items()}
+    })
+
+def parse_thesis_searches(chunk_path: str) -> pd.DataFrame:
+    """
+    Decode the theses.fr responses listed in a chunk file and classify them.
+
+    Returns one verdict row per searched name, along with the re-encoded
+    response under 'search' so the main process can cache it.
+    """
+    chunk = pd.read_parquet(chunk_path)
+    verdicts, searches = [], []
+    for path in chunk['path']:
+        data = read_downloaded(path)
+        verdicts.append(classify_thesis_search(data))
+        searches.append(orjson.dumps(data).decode() if data is not None else None)
+    
+    return verdict_frame(chunk['display_name'].tolist(), True, verdicts, search=searches)
+
+def analyze_thesis_results(results_file: str, names_file: str, final_output: str, cache: LookupCache) -> dict:
+    """
+    Analyze thesis search results and create final classification.
+
+    Each distinct name gets a verdict, which is then joined back onto every
+    author of names_file carrying that name. Searches fetched in this run are
+    added to the cache, and names that were not fetched are answered from it.
+    """
     try:
-        df = pd.read_csv(results_file)
+        existing = downloaded_files()
+        report = pd.read_parquet(results_file, columns=['display_name', 'http_status', 'path'])
+        fetched = report['http_status'] == 200  # Use http_status instead of status
+        
+        # Decode and classify the fetched searches on all cores
+        successful = report.loc[fetched, ['display_name', 'path']]
+        successful['path'] = successful['path'].where(successful['path'].isin(existing))
+        parsed = map_chunks(successful, parse_thesis_searches)
+        for chunk_verdicts in parsed:
+            searches = chunk_verdicts.dropna(subset=['search'])
+            cache.set_thesis_searches(dict(zip(searches['display_name'], searches['search'])))
+        
+        # Names that were not fetched are answered from the cache when possible
+        missing = report.loc[~fetched, 'display_name']
+        cached = cache.thesis_searches(missing)
+        searched = [name in cached for name in missing]
+        verdicts = [classify_thesis_search(orjson.loads(cached[name]) if found else None)
+                    for name, found in zip(missing, searched)]
+        
+        verdicts = pd.concat(
+            [verdict_frame(missing.tolist(), searched, verdicts)] + [v[VERDICT_COLUMNS] for v in parsed],
+            ignore_index=True
+        )
         
         stats = {
-            'total': len(df),
+            'total': 0,
             'successful_searches': 0,
             'potential_matches': 0,
             'confident_matches': 0,
@@ -409,65 +460,22 @@ def analyze_thesis_results(results_file: str, final_output: str) -> dict:
             'authors_ever_in_france': 0
         }
         
-        final_results = []
-        
-        for _, row in df.iterrows():
-            result = {
-                'author_id': row['author_id'],
-                'display_name': row['display_name'],
-                'started_in_france': row['started_in_france'],
-                'ever_in_france': row.get('ever_in_france', False),
-                'country_sequence': row['country_sequence'],
-                'has_potential_thesis': False,
-                'thesis_confidence': 'none',
-                'thesis_details': None
-            }
-            
-            # Update stats for authors ever in France
-            if result['ever_in_france']:
-                stats['authors_ever_in_france'] += 1
-            
-            if row['http_status'] == 200:  # Use http_status instead of status
-                stats['successful_searches'] += 1
-                try:
-                    # Read from downloaded JSON file
-                    json_path = Path('downloaded') / row['path']
-                    if json_path.exists():
-                        with open(json_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                        
-                        personnes = data.get('personnes', [])
-                        
-                        if personnes:
-                            stats['potential_matches'] += 1
-                            result['has_potential_thesis'] = True
-                            
-                            # Check for author role (high confidence)
-                            for person in personnes:
-                                if 'Auteur / Autrice' in person.get('roles', {}):
-                                    stats['confident_matches'] += 1
-                                    result['thesis_confidence'] = 'high'
-                                    result['thesis_details'] = json.dumps({
-                                        'name': f"{person.get('prenom', '')} {person.get('nom', '')}".strip(),
-                                        'idref': person.get('id'),
-                                        'thesis_id': person.get('these'),
-                                        'disciplines': person.get('disciplines', []),
-                                        'establishments': person.get('etablissements', [])
-                                    })
-                                    break
-                            else:
-                                result['thesis_confidence'] = 'medium'
-                            
-                            if row['started_in_france']:
-                                stats['france_starters_with_phd'] += 1
-                                
-                except (json.JSONDecodeError, KeyError, FileNotFoundError):
-                    pass
-            
-            final_results.append(result)
-        
-        # Save results
-        pd.DataFrame(final_results).to_csv(final_output, index=False)
+        # Join the verdicts back onto every author sharing the name
+        with pacsv.CSVWriter(final_output, RESULTS_SCHEMA) as writer:
+            for authors in iter_parquet(names_file, NAMES_SCHEMA.names):
+                results = authors.merge(verdicts, on='display_name', how='left')
+                results = results.fillna({'searched': False, 'has_potential_thesis': False, 'thesis_confidence': 'none'})
+                results = results.astype({'searched': bool, 'has_potential_thesis': bool})
+                
+                stats['total'] += len(results)
+                stats['successful_searches'] += int(results['searched'].sum())
+                stats['potential_matches'] += int(results['has_potential_thesis'].sum())
+                stats['confident_matches'] += int(results['thesis_confidence'].eq('high').sum())
+                stats['france_starters_with_phd'] += int((results['has_potential_thesis'] & results['started_in_france']).sum())
+                stats['authors_ever_in_france'] += int(results['ever_in_france'].sum())
+                
+                # Save results for this chunk
+                writer.write_table(pa.Table.from_pandas(results, schema=RESULTS_SCHEMA, preserve_index=False))
         
         # Log stats
         logger.info("=== Results Summary ===")
@@ -481,7 +489,7 @@ def analyze_thesis_results(results_file: str, final_output: str) -> dict:
         return {}
 
 def main():
-    global USE_BROWSER_AUTH
+    global USE_BROWSER_AUTH, MAILTO
     
     parser = argparse.ArgumentParser(description="Mark authors with French PhD evidence using minet")
     parser.add_argument('input_file', help='Input CSV with author sequences')
@@ -501,63 +509,72 @@ def main():
                        help='Number of threads for theses.fr requests (default: 5)')
     parser.add_argument('--thesis-domain-parallelism', type=int, default=1,
                        help='Domain parallelism for theses.fr requests (default: 1)')
-    parser.add_argument('--throttle', type=float, default=0.12,
-                       help='Throttle time between requests in seconds (default: 0.12 for 8.5 req/sec)')
+    parser.add_argument('--throttle', type=float, default=None,
+                       help='Throttle time between requests in seconds, for both APIs, 0 meaning the default '
+                            '(default: 0.12 for 8.5 req/sec on OpenAlex, 0.1 for 10 req/sec with --mailto, '
+                            'and 0.2 for 5 req/sec on theses.fr)')
     parser.add_argument('--no-cookies', action='store_true',
                        help='Disable browser cookie extraction (use if browser access fails)')
+    parser.add_argument('--mailto', default=MAILTO,
+                       help='Contact email sent to OpenAlex to use its polite pool (default: $OPENALEX_MAILTO)')
+    parser.add_argument('--cache-file', default=DEFAULT_CACHE_FILE,
+                       help=f'SQLite cache of fetched names and thesis searches (default: {DEFAULT_CACHE_FILE})')
     
     args = parser.parse_args()
     
     # Set global cookie flag
     USE_BROWSER_AUTH = not args.no_cookies
+    MAILTO = args.mailto
     
     # File names
     base = Path(args.input_file).stem
-    author_urls = f"{base}_urls.csv"
-    openalex_results = f"{base}_openalex.csv"
-    names_file = f"{base}_names.csv"
-    thesis_urls = f"{base}_thesis_urls.csv"
-    thesis_results = f"{base}_thesis_results.csv"
+    author_urls = f"{base}_urls.parquet"
+    authors_file = f"{base}_authors.parquet"
+    openalex_results = f"{base}_openalex.parquet"
+    names_file = f"{base}_names.parquet"
+    thesis_urls = f"{base}_thesis_urls.parquet"
+    thesis_results = f"{base}_thesis_results.parquet"
     
     logger.info("Starting PhD detection pipeline with minet")
     cookie_status = "enabled" if USE_BROWSER_AUTH else "disabled"
     logger.info(f"Performance settings: OpenAlex({args.openalex_threads} threads, {args.openalex_domain_parallelism} domain parallelism), "
                f"Theses.fr({args.thesis_threads} threads, {args.thesis_domain_parallelism} domain parallelism), "
-               f"Throttle: {args.throttle}s, Browser cookies: {cookie_status}")
+               f"Throttle: {'per-API default' if args.throttle is None else f'{args.throttle}s'}, "
+               f"Browser cookies: {cookie_status}")
+    
+    cache = LookupCache(args.cache_file)
     
     # Step 1: Prepare OpenAlex URLs
-    if not prepare_author_urls(args.input_file, author_urls, args.france_only):
+    if not prepare_author_urls(args.input_file, author_urls, authors_file, cache, args.france_only):
         return 1
     
     # Step 2: Fetch author data
     logger.info("Fetching author names from OpenAlex...")
-    if not fetch_with_minet_custom(author_urls, openalex_results, 
-                                  args.openalex_threads, args.openalex_domain_parallelism, args.throttle):
-        return 1
-    
-    # Step 3: Extract names
-    if not extract_author_names(openalex_results, names_file):
+    if not fetch(author_urls, openalex_results, threads=args.openalex_threads, throttle=args.throttle,
+                 domain_parallelism=args.openalex_domain_parallelism, domain='openalex'):
         return 1
     
-    # Step 4: Prepare thesis search URLs
-    if not prepare_thesis_urls(names_file, thesis_urls):
+    # Step 3: Extract names and prepare thesis search URLs
+    if not extract_author_names(openalex_results, authors_file, names_file, thesis_urls, cache):
         return 1
     
-    # Step 5: Search theses.fr
+    # Step 4: Search theses.fr
     logger.info("Searching theses.fr...")
-    if not fetch_thesis_with_minet_custom(thesis_urls, thesis_results,
-                                         args.thesis_threads, args.thesis_domain_parallelism, args.throttle):
+    # theses.fr has SSL issues
+    if not fetch(thesis_urls, thesis_results, threads=args.thesis_threads, throttle=args.throttle,
+                 domain_parallelism=args.thesis_domain_parallelism, insecure=True, domain='theses'):
         return 1
     
-    # Step 6: Analyze and save final results
-    if not analyze_thesis_results(thesis_results, args.output):
+    # Step 5: Analyze and save final results
+    if not analyze_thesis_results(thesis_results, names_file, args.output, cache):
         return 1
     
+    cache.close()
     logger.info(f"PhD detection completed! Results in {args.output}")
     
     # Cleanup
     if not args.keep_temp:
-        for temp_file in [author_urls, openalex_results, names_file, thesis_urls, thesis_results]:
+        for temp_file in [author_urls, authors_file, openalex_results, names_file, thesis_urls, thesis_results]:
             try:
                 Path(temp_file).unlink()
             except FileNotFoundError:
@@ -1,81 +1,339 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import argparse
+import csv
+import io
+import os
 import sys
-from collections import defaultdict
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pandas.api.types import union_categoricals
 
-def create_author_sequences_optimized(input_file, output_file):
+# Worker processes cleaning chunks in parallel
+CLEAN_WORKERS = os.cpu_count() or 1
+
+# Authors per record batch when streaming the output CSV
+WRITE_BATCH_SIZE = 10_000
+
+# Output columns, all sequences being ' -> ' joined strings, with the
+# first publication year precomputed for downstream scripts
+OUTPUT_SCHEMA = pa.schema([
+    ('author_id', pa.string()),
+    ('publication_years_sequence', pa.string()),
+    ('country_codes_sequence', pa.string()),
+    ('min_year', pa.int32())
+])
+
+# Approximate size of an input CSV row, so CSV blocks hold about chunk_size rows
+CSV_ROW_BYTES = 64
+
+# Typed schema of the Parquet copy of the input
+PARQUET_SCHEMA = pa.schema([
+    ('author_id', pa.string()),
+    ('publication_year', pa.int32()),
+    ('country_codes', pa.string())
+])
+
+def parse_malformed_rows(lines, header, convert_options):
+    """
+    Parses CSV rows with missing or extra fields as pandas did: missing trailing
+    fields are null, and extra ones are ignored.
+
+    Args:
+        lines (list): Raw text of the malformed rows.
+        header (list): Column names of the input file.
+        convert_options (pacsv.ConvertOptions): Options the rows are converted with.
+
+    Returns:
+        pa.Table: The rows, with the included columns only.
+    """
+    use_cols = convert_options.include_columns
+    positions = [header.index(column) for column in use_cols]
+
+    # Re-emit the used fields as a well-formed CSV, read the same way as the input
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(use_cols)
+    for line in lines:
+        fields = next(csv.reader(io.StringIO(line)), [])
+        writer.writerow([fields[i] if i < len(fields) else '' for i in positions])
+
+    return pacsv.read_csv(io.BytesIO(buffer.getvalue().encode()), convert_options=convert_options)
+
+def read_input(input_file, use_cols, chunk_size, strict=False):
+    """
+    Iterates over the input file in Arrow record batches (or tables), dispatching on its extension.
+
+    Parquet files are read column-wise with pyarrow and keep their types, any
+    other file is parsed as CSV by pyarrow's multi-threaded reader, one chunk
+    per block of chunk_size * CSV_ROW_BYTES bytes, with every column read as strings.
+
+    Args:
+        input_file (str): Path to the input CSV or Parquet file.
+        use_cols (list): Columns to load.
+        chunk_size (int): Number of rows per chunk, approximate for CSV files.
+        strict (bool): Fail on malformed CSV rows instead of recovering each one.
+    """
+    if input_file.endswith('.parquet'):
+        parquet_file = pq.ParquetFile(input_file)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=use_cols):
+            yield batch
+        return
+
+    convert_options = pacsv.ConvertOptions(
+        include_columns=use_cols,
+        # Read all used columns as strings to be safe, years are parsed while cleaning.
+        column_types={column: pa.string() for column in use_cols},
+        strings_can_be_null=True
+    )
+
+    # Rows with a wrong number of fields are set aside by the reader, with
+    # their row number, then recovered and put back in place
+    malformed = []
+    def set_aside(row):
+        malformed.append((row.number, row.text))
+        return 'skip'
+
+    reader = pacsv.open_csv(
+        input_file,
+        read_options=pacsv.ReadOptions(block_size=chunk_size * CSV_ROW_BYTES, use_threads=True),
+        parse_options=pacsv.ParseOptions(invalid_row_handler=None if strict else set_aside),
+        convert_options=convert_options
+    )
+
+    with open(input_file, newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f), [])
+    pending = []
+    row = 2  # Number of the next row of the file, the header being row 1
+    for batch in reader:
+        # The reader may already be parsing later blocks, so only keep the
+        # set-aside rows falling within this one
+        seen = malformed[:]
+        del malformed[:len(seen)]
+        pending = sorted(pending + seen)
+        taken = []
+        while pending and pending[0][0] < row + batch.num_rows + len(taken):
+            taken.append(pending.pop(0))
+
+        if taken:
+            recovered = parse_malformed_rows([text for _, text in taken], header, convert_options)
+
+            # Interleave the recovered rows with the others, in file order
+            positions = np.array([number - row for number, _ in taken])
+            order = np.empty(batch.num_rows + len(taken), dtype=np.int64)
+            is_recovered = np.zeros(len(order), dtype=bool)
+            is_recovered[positions] = True
+            order[~is_recovered] = np.arange(batch.num_rows)
+            order[positions] = batch.num_rows + np.arange(len(taken))
+            batch = pa.concat_tables([pa.Table.from_batches([batch]), recovered]).take(order)
+
+        row += len(batch)
+        yield batch
+
+    pending = sorted(pending + malformed)
+    if pending:
+        yield parse_malformed_rows([text for _, text in pending], header, convert_options)
+
+def convert_to_parquet(input_file, output_file, chunk_size=1_000_000, strict=False):
     """
-    Reads a large author sequences CSV in chunks, processes it efficiently to
-    create publication and country sequences for each author, and saves the
-    result to a new CSV.
+    Converts the input CSV once to a zstd-compressed Parquet file, with years
+    parsed and truncated to int32 (null when invalid or out of range), so later
+    runs skip CSV parsing.
 
     Args:
         input_file (str): Path to the input CSV file.
+        output_file (str): Path to save the Parquet file.
+        chunk_size (int): Number of rows converted at once.
+        strict (bool): Fail on malformed CSV rows instead of recovering them.
+    """
+    print(f"Converting '{input_file}' to Parquet '{output_file}'...")
+
+    # Write to a temporary file so an interrupted conversion is never picked up
+    tmp_file = output_file + '.tmp'
+    int32 = np.iinfo(np.int32)
+    try:
+        with pq.ParquetWriter(tmp_file, PARQUET_SCHEMA, compression='zstd') as writer:
+            for batch in read_input(input_file, PARQUET_SCHEMA.names, chunk_size, strict):
+                chunk = batch.to_pandas()
+                # Truncate fractional years like the CSV path does, years beyond int32 becoming null
+                years = np.trunc(pd.to_numeric(chunk['publication_year'], errors='coerce').astype('float64'))
+                chunk['publication_year'] = years.where(years.between(int32.min, int32.max)).astype('Int32')
+                writer.write_table(pa.Table.from_pandas(chunk[PARQUET_SCHEMA.names], schema=PARQUET_SCHEMA, preserve_index=False))
+        os.replace(tmp_file, output_file)
+
+    except FileNotFoundError:
+        print(f"Error: Input file not found at '{input_file}'", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"An unexpected error occurred while converting to Parquet: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+def clean_chunk(batch):
+    """
+    Cleans a chunk of raw publications: drops rows without author or valid year,
+    and stores author ids and brace-free country codes as categoricals.
+
+    Args:
+        batch (pa.RecordBatch): Raw author_id, publication_year and country_codes columns.
+
+    Returns:
+        pd.DataFrame: The cleaned chunk, with int32 years.
+    """
+    # Converted here, in the worker, as Arrow batches are much cheaper to send than DataFrames
+    chunk = batch.to_pandas()
+
+    # Robustly convert year to a number, discarding rows that fail.
+    # Years read from Parquet are already typed.
+    if not pd.api.types.is_integer_dtype(chunk['publication_year']):
+        chunk['publication_year'] = pd.to_numeric(chunk['publication_year'], errors='coerce')
+    chunk.dropna(subset=['author_id', 'publication_year'], inplace=True)
+    chunk['publication_year'] = chunk['publication_year'].astype('int32')
+
+    # Store the repeated strings as categoricals, so they are hashed once per distinct value
+    chunk['author_id'] = chunk['author_id'].astype('category')
+    country_codes = chunk['country_codes'].fillna('<empty>').astype('category')
+
+    # Strip the braces from country codes, once per distinct value
+    categories = country_codes.cat.categories
+    cleaned = pa.array(np.asarray(categories, dtype=object), type=pa.string())
+    cleaned = pc.replace_substring(pc.replace_substring(cleaned, '{', ''), '}', '')
+
+    # Distinct values may collapse once cleaned (e.g. '{FR}' and 'FR'), so recode the categories
+    recoded, cleaned = pd.factorize(np.asarray(cleaned.to_pylist(), dtype=object))
+    chunk['country_codes'] = pd.Categorical.from_codes(recoded[country_codes.cat.codes],
+                                                       categories=pd.Index(cleaned, dtype=object))
+
+    return chunk
+
+def clean_chunks(chunks, workers=CLEAN_WORKERS):
+    """
+    Cleans chunks on a process pool, yielding them back in input order.
+
+    At most one more chunk than there are workers is in flight, so the input
+    is never read much further ahead than it is cleaned.
+
+    Args:
+        chunks (iterable): Raw record batches, as read by read_input.
+        workers (int): Number of worker processes.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(clean_chunk, chunk))
+            if len(pending) > workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def create_author_sequences_optimized(input_file, output_file, strict=False):
+    """
+    Reads a large author sequences CSV (or its Parquet copy) in chunks,
+    processes it efficiently to create publication and country sequences for
+    each author, and saves the result to a new CSV.
+
+    Args:
+        input_file (str): Path to the input CSV or Parquet file.
         output_file (str): Path to save the output CSV file.
+        strict (bool): Fail on malformed CSV rows instead of recovering them.
     """
     try:
-        # This dictionary will store {author_id: [(year, country_codes), ...]}
+        # Per-chunk columns, sorted by author and year once all chunks are read.
+        # Strings are kept as categoricals, so each publication only costs its
+        # year and two small integer codes.
         # It's much more memory-efficient than a massive DataFrame.
-        author_data = defaultdict(list)
+        authors, years, countries = [], [], []
 
         # Define dtypes and columns for efficiency. We only load what we need.
         use_cols = ['author_id', 'publication_year', 'country_codes']
         
-        # Process the file in chunks of 1 million rows.
+        # Process the file in chunks of 1 million rows (about CSV_ROW_BYTES each for CSV).
         # Adjust this size based on your server's memory.
         chunk_size = 1_000_000
         
-        print(f"Reading input file '{input_file}' in chunks of {chunk_size:,} rows...")
-
-        chunk_iterator = pd.read_csv(
-            input_file,
-            header=0,  # Treat the first row as a header.
-            usecols=use_cols,
-            on_bad_lines='skip',
-            engine='c',  # Using the much faster C engine
-            sep=',',
-            chunksize=chunk_size,
-            dtype=str  # Read all used columns as strings to be safe.
-        )
+        if input_file.endswith('.parquet'):
+            print(f"Reading input file '{input_file}' in chunks of {chunk_size:,} rows...")
+        else:
+            print(f"Reading input file '{input_file}' in blocks of {chunk_size * CSV_ROW_BYTES >> 20} MiB "
+                  f"(about {chunk_size:,} rows)...")
+
+        chunk_iterator = read_input(input_file, use_cols, chunk_size, strict)
         
         total_rows_processed = 0
-        for i, chunk in enumerate(chunk_iterator):
-            # --- Clean data in the chunk ---
-            # Robustly convert year to a number, discarding rows that fail.
-            chunk['publication_year'] = pd.to_numeric(chunk['publication_year'], errors='coerce')
-            chunk.dropna(subset=['author_id', 'publication_year'], inplace=True)
-            chunk['publication_year'] = chunk['publication_year'].astype('int32')
-            
-            # Clean country codes
-            chunk['country_codes'] = chunk['country_codes'].fillna('<empty>').str.replace('[{}]', '', regex=True)
-
-            # --- Aggregate data into the dictionary ---
-            for row in chunk.itertuples(index=False):
-                author_data[row.author_id].append((row.publication_year, row.country_codes))
+        # --- Clean the chunks in parallel ---
+        for i, chunk in enumerate(clean_chunks(chunk_iterator)):
+            # --- Keep the cleaned columns ---
+            authors.append(chunk['author_id'].array)
+            years.append(chunk['publication_year'].to_numpy())
+            countries.append(chunk['country_codes'].array)
             
             total_rows_processed += len(chunk)
             print(f"  ...processed chunk {i + 1}, total rows so far: {total_rows_processed:,}")
 
         print("\nAll chunks processed. Aggregating sequences for each author...")
 
-        # --- Convert aggregated data to final format ---
-        final_results = []
-        for author_id, records in author_data.items():
-            records.sort(key=lambda x: x[0])  # Sort by publication year
-            
-            pub_year_seq = ' -> '.join(str(r[0]) for r in records)
-            country_seq = ' -> '.join(r[1] for r in records)
-            
-            final_results.append({
-                'author_id': author_id,
-                'publication_years_sequence': pub_year_seq,
-                'country_codes_sequence': country_seq
-            })
-
-        print(f"Aggregation complete. Creating final DataFrame for {len(final_results):,} authors.")
-        output_df = pd.DataFrame(final_results)
-        
+        # --- Stream the sequences to the output file ---
         print(f"Saving results to '{output_file}'...")
-        output_df.to_csv(output_file, index=False)
+        with pacsv.CSVWriter(output_file, OUTPUT_SCHEMA) as writer:
+            if total_rows_processed:
+                # Number authors in order of first appearance, then sort by author and year.
+                # The sort is stable, so publications of the same year keep their input order.
+                codes, author_ids = pd.factorize(union_categoricals(authors))
+                countries = union_categoricals(countries)
+                table = pa.table({
+                    'author': codes.astype(np.int32),
+                    'publication_year': np.concatenate(years),
+                    'country_codes': countries.codes
+                })
+                # The per-chunk columns are merged, release them before sorting
+                authors.clear()
+                years.clear()
+                table = table.take(pc.sort_indices(table, sort_keys=[('author', 'ascending'),
+                                                                     ('publication_year', 'ascending')]))
+
+                # Without threads, groups and their lists keep the sorted order
+                grouped = table.group_by('author', use_threads=False).aggregate([
+                    ('publication_year', 'list'),
+                    ('country_codes', 'list')
+                ])
+
+                # Turn the lists of country codes back into lists of strings
+                country_lists = grouped['country_codes_list'].combine_chunks()
+                country_names = pa.array(np.asarray(countries.categories, dtype=object), type=pa.string())
+                country_lists = pa.ListArray.from_arrays(country_lists.offsets,
+                                                         country_names.take(country_lists.values))
+
+                # Format each year of the range once and look the strings up,
+                # unless the range is wider than the years themselves
+                year_lists = grouped['publication_year_list'].combine_chunks()
+                year_range = pc.min_max(year_lists.values).as_py()
+                if year_range['max'] - year_range['min'] < len(year_lists.values):
+                    year_names = pc.cast(pa.array(np.arange(year_range['min'], year_range['max'] + 1, dtype=np.int32)),
+                                         pa.string())
+                    year_strings = pa.ListArray.from_arrays(
+                        year_lists.offsets, year_names.take(pc.subtract(year_lists.values, year_range['min'])))
+                else:
+                    year_strings = pc.cast(year_lists, pa.list_(pa.string()))
+
+                sequences = pa.table([
+                    pa.array(np.asarray(author_ids, dtype=object)[grouped['author'].to_numpy()], type=pa.string()),
+                    pc.binary_join(year_strings, ' -> '),
+                    pc.binary_join(country_lists, ' -> '),
+                    # Years are sorted, so the first one is the smallest
+                    pc.list_element(year_lists, 0)
+                ], schema=OUTPUT_SCHEMA)
+
+                # Write WRITE_BATCH_SIZE authors at a time
+                for batch in sequences.to_batches(max_chunksize=WRITE_BATCH_SIZE):
+                    writer.write_batch(batch)
+
+                print(f"Aggregation complete. Wrote sequences for {len(sequences):,} authors.")
         
         print("\nProcessing complete!")
 
@@ -87,6 +345,19 @@ def create_author_sequences_optimized(input_file, output_file):
         sys.exit(1)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build per-author publication and country sequences")
+    parser.add_argument('--strict', action='store_true',
+                        help='Fail on malformed CSV rows instead of recovering them (faster on known-clean input)')
+    args = parser.parse_args()
+
     INPUT_CSV = 'author_sequences2.csv'
+    INPUT_PARQUET = 'author_sequences2.parquet'
     OUTPUT_CSV = 'author_sequences_final.py.csv'
-    create_author_sequences_optimized(INPUT_CSV, OUTPUT_CSV) 
\ No newline at end of file
+
+    # Convert the CSV once, or again whenever it is newer than its Parquet copy
+    if os.path.exists(INPUT_CSV) and (not os.path.exists(INPUT_PARQUET)
+                                      or os.path.getmtime(INPUT_CSV) > os.path.getmtime(INPUT_PARQUET)):
+        convert_to_parquet(INPUT_CSV, INPUT_PARQUET, strict=args.strict)
+
+    create_author_sequences_optimized(INPUT_PARQUET if os.path.exists(INPUT_PARQUET) else INPUT_CSV, OUTPUT_CSV,
+                                      strict=args.strict) 
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+Helpers for parsing the ' -> ' separated country sequences written by process_authors.py.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Placeholders used for publications without any country
+EMPTY_MARKERS = pa.array(['', 'empty', '<empty>'])
+
+# Sequences whose first non-empty entry may be France, matched case-insensitively.
+# This is a cheap superset of the France starters, confirmed by first_countries.
+FR_START = r'^\s*(?:(?:empty|<empty>|)\s*->\s*)*FR(?:,|\b)'
+
+def first_countries(sequences: pd.Series) -> pd.Series:
+    """
+    Finds the first country of each author's career with Arrow compute kernels.
+
+    The first non-empty entry of the sequence is used. An entry can hold several
+    countries like 'FR,GB', in which case only the first one is kept.
+
+    Args:
+        sequences (pd.Series): ' -> ' separated country sequences.
+
+    Returns:
+        pd.Series: The first country code per row (None if none), aligned on the input index.
+    """
+    array = pa.array(sequences, from_pandas=True)
+    if not pa.types.is_string(array.type):
+        array = array.cast(pa.string())
+
+    # Flatten every sequence into its entries, remembering which row each came from
+    entries = pc.split_pattern(array, ' -> ')
+    tokens = pc.utf8_trim_whitespace(pc.list_flatten(entries))
+    parents = pc.list_parent_indices(entries)
+
+    non_empty = pc.invert(pc.is_in(pc.utf8_lower(tokens), value_set=EMPTY_MARKERS))
+    tokens = tokens.filter(non_empty)
+    parents = parents.filter(non_empty).to_numpy()
+
+    # Parents are sorted, so a row's first occurrence is its first non-empty entry
+    rows, first_positions = np.unique(parents, return_index=True)
+    first = pc.utf8_trim_whitespace(pc.list_element(pc.split_pattern(tokens.take(first_positions), ','), 0))
+
+    # Scatter back onto all rows, rows without any entry staying null
+    positions = np.full(len(array), -1, dtype=np.int64)
+    positions[rows] = np.arange(len(rows))
+    first = first.take(pa.array(positions, mask=positions < 0))
+
+    return pd.Series(first.to_numpy(zero_copy_only=False), index=sequences.index)
+
+def starts_in_france(sequences: pd.Series) -> pd.Series:
+    """
+    Flags the sequences whose first country is France.
+
+    A single anchored regex pass rules out most rows, only the candidates it
+    leaves are tokenized by first_countries.
+
+    Args:
+        sequences (pd.Series): ' -> ' separated country sequences.
+
+    Returns:
+        pd.Series: Boolean flags aligned on the input index.
+    """
+    array = pa.array(sequences, from_pandas=True)
+    if not pa.types.is_string(array.type):
+        array = array.cast(pa.string())
+
+    candidates = pc.fill_null(pc.match_substring_regex(array, FR_START, ignore_case=True), False)
+    rows = np.flatnonzero(candidates.to_numpy(zero_copy_only=False))
+
+    flags = np.zeros(len(array), dtype=bool)
+    flags[rows] = first_countries(sequences.iloc[rows]).eq('FR').to_numpy()
+
+    return pd.Series(flags, index=sequences.index)
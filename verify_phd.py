@@ -1,13 +1,50 @@
 import requests
+import orjson
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import argparse
+import asyncio
 import sys
 
-def get_author_details(author_id):
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
+# On-disk cache of API responses, used when requests-cache is installed
+HTTP_CACHE_FILE = 'openalex.sqlite'
+HTTP_CACHE_EXPIRE_AFTER = 86400  # 1 day
+
+# Number of authors verified concurrently
+CONCURRENCY = 16
+
+# theses.fr roles marking a person as the author of a thesis
+AUTHOR_ROLES = frozenset({'Auteur / Autrice'})
+
+def create_session():
+    """
+    Builds a shared HTTP session keeping connections to the APIs alive, retrying
+    on rate limiting and server errors, and caching responses on disk when
+    requests-cache is available.
+    """
+    if requests_cache is not None:
+        session = requests_cache.CachedSession(HTTP_CACHE_FILE, expire_after=HTTP_CACHE_EXPIRE_AFTER)
+    else:
+        session = requests.Session()
+
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_author_details(session, author_id):
     """
     Fetches the author's display name, concepts, and institution from the OpenAlex API.
     
     Args:
+        session (requests.Session): The shared HTTP session.
         author_id (str): The OpenAlex author ID (e.g., A5000002327).
         
     Returns:
@@ -15,9 +52,9 @@ def get_author_details(author_id):
     """
     url = f"https://api.openalex.org/authors/{author_id}"
     try:
-        response = requests.get(url)
+        response = session.get(url)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
         
         author_details = {
             'display_name': data.get('display_name'),
@@ -26,16 +63,18 @@ def get_author_details(author_id):
         }
         return author_details
         
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         print(f"Error fetching data from OpenAlex API: {e}", file=sys.stderr)
         return None
 
-def search_theses_fr(author_name):
+def search_theses_fr(session, author_name, report):
     """
     Searches theses.fr for a given author name and returns the search results.
     
     Args:
+        session (requests.Session): The shared HTTP session.
         author_name (str): The full name of the author to search for.
+        report (list): The author's report lines, the search steps being appended to it.
         
     Returns:
         list: A list of dictionaries, each representing a found thesis.
@@ -48,12 +87,12 @@ def search_theses_fr(author_name):
     }
     
     try:
-        print(f"Searching theses.fr API for '{author_name}'...")
-        response = requests.get(search_url, params=params, headers=headers, verify=False)
-        print(f"--> Requesting URL: {response.url}")
+        report.append(f"Searching theses.fr API for '{author_name}'...")
+        response = session.get(search_url, params=params, headers=headers, verify=False)
+        report.append(f"--> Requesting URL: {response.url}")
         response.raise_for_status()
         
-        data = response.json()
+        data = orjson.loads(response.content)
         
         if not data.get('personnes'):
             return []
@@ -61,7 +100,7 @@ def search_theses_fr(author_name):
         results = []
         for person in data['personnes']:
             # We only care about theses where the person is the author.
-            if 'Auteur / Autrice' in person.get('roles', {}):
+            if not AUTHOR_ROLES.isdisjoint(person.get('roles') or {}):
                 thesis_info = {
                     'name': f"{person.get('prenom')} {person.get('nom')}",
                     'idref': person.get('id'),
@@ -76,7 +115,7 @@ def search_theses_fr(author_name):
     except requests.exceptions.RequestException as e:
         print(f"Error searching on theses.fr API: {e}", file=sys.stderr)
         return []
-    except ValueError: # Catches JSON decoding errors
+    except orjson.JSONDecodeError:
         print(f"Error decoding JSON from theses.fr API.", file=sys.stderr)
         return []
 
@@ -93,21 +132,26 @@ def find_best_match(author_details, thesis_records):
     """
     scored_results = []
 
+    # Author-side values are the same for every record, prepare them once
+    institution = author_details['institution']
+    institution_lower = institution.lower() if institution else None
+    concepts = author_details['concepts']
+
     for thesis in thesis_records:
         score = 0
         evidence = []
 
         # 1. Check for institution match (+10 points)
-        if author_details['institution'] and thesis['establishments']:
+        if institution_lower and thesis['establishments']:
             # Check if any part of the OpenAlex institution name is in the thesis establishments string
-            if author_details['institution'].lower() in thesis['establishments'].lower():
+            if institution_lower in thesis['establishments'].lower():
                 score += 10
-                evidence.append(f"Institution match on '{author_details['institution']}'")
+                evidence.append(f"Institution match on '{institution}'")
 
         # 2. Check for discipline/concept match (+5 points per match)
-        if author_details['concepts'] and thesis['disciplines']:
-            thesis_disciplines_lower = [d.lower() for d in thesis['disciplines'].split(', ')]
-            for concept in author_details['concepts']:
+        if concepts and thesis['disciplines']:
+            thesis_disciplines_lower = {d.lower() for d in thesis['disciplines'].split(', ')}
+            for concept in concepts:
                 if concept in thesis_disciplines_lower:
                     score += 5
                     evidence.append(f"Discipline match on '{concept.title()}'")
@@ -120,58 +164,100 @@ def find_best_match(author_details, thesis_records):
     # Sort by score in descending order
     return sorted(scored_results, key=lambda x: x['match_score'], reverse=True)
 
-def main():
-    parser = argparse.ArgumentParser(description="Verify an author's PhD from France using their OpenAlex ID.")
-    parser.add_argument("author_id", help="The OpenAlex ID of the author to verify (e.g., A5000002327).")
-    
-    if len(sys.argv) == 1:
-        parser.print_help(sys.stderr)
-        sys.exit(1)
-        
-    args = parser.parse_args()
-    
-    author_details = get_author_details(args.author_id)
+def format_thesis(thesis, title):
+    """Formats a thesis record as indented report lines."""
+    return [
+        f"\n  {title}:",
+        f"    Name:           {thesis['name']}",
+        f"    ID:             {thesis['idref']}",
+        f"    Thesis ID:      {thesis['thesis_id']}",
+        f"    Disciplines:    {thesis['disciplines']}",
+        f"    Establishments: {thesis['establishments']}"
+    ]
+
+def verify_author(session, author_id):
+    """
+    Looks up an author on OpenAlex, searches theses.fr for their name and
+    scores the thesis records found.
+
+    Args:
+        session (requests.Session): The shared HTTP session.
+        author_id (str): The OpenAlex author ID (e.g., A5000002327).
+
+    Returns:
+        tuple: (found, report), found being False if the author could not be
+               retrieved, and report the lines to print for this author.
+    """
+    author_details = get_author_details(session, author_id)
     
     if not author_details or not author_details['display_name']:
-        print(f"Could not retrieve details for author ID: {args.author_id}")
-        sys.exit(1)
+        return False, [f"Could not retrieve details for author ID: {author_id}"]
         
-    print(f"Found author: {author_details['display_name']} (ID: {args.author_id})")
+    report = [f"Found author: {author_details['display_name']} (ID: {author_id})"]
     if author_details['institution']:
-        print(f"  Institution: {author_details['institution']}")
+        report.append(f"  Institution: {author_details['institution']}")
     if author_details['concepts']:
-        print(f"  Concepts: {', '.join(author_details['concepts']).title()}")
+        report.append(f"  Concepts: {', '.join(author_details['concepts']).title()}")
 
-    
-    theses = search_theses_fr(author_details['display_name'])
+    theses = search_theses_fr(session, author_details['display_name'], report)
     
     if not theses:
-        print("\n--> No thesis records found on theses.fr for this author name.")
-        sys.exit(0)
+        report.append("\n--> No thesis records found on theses.fr for this author name.")
+        return True, report
 
     best_matches = find_best_match(author_details, theses)
 
     if not best_matches:
-        print("\n--> Found thesis records, but none could be confidently matched by institution or discipline.")
-        print("    Displaying top raw result as a fallback:")
-        thesis = theses[0]
-        print("\n  Record 1:")
-        print(f"    Name:           {thesis['name']}")
-        print(f"    ID:             {thesis['idref']}")
-        print(f"    Thesis ID:      {thesis['thesis_id']}")
-        print(f"    Disciplines:    {thesis['disciplines']}")
-        print(f"    Establishments: {thesis['establishments']}")
+        report.append("\n--> Found thesis records, but none could be confidently matched by institution or discipline.")
+        report.append("    Displaying top raw result as a fallback:")
+        report.extend(format_thesis(theses[0], "Record 1"))
 
     else:
-        print(f"\n--> Found {len(best_matches)} confident match(es). Best match presented first:")
+        report.append(f"\n--> Found {len(best_matches)} confident match(es). Best match presented first:")
         for i, thesis in enumerate(best_matches, 1):
-            print(f"\n  Record {i} (Match Score: {thesis['match_score']}):")
-            print(f"    Name:           {thesis['name']}")
-            print(f"    ID:             {thesis['idref']}")
-            print(f"    Thesis ID:      {thesis['thesis_id']}")
-            print(f"    Disciplines:    {thesis['disciplines']}")
-            print(f"    Establishments: {thesis['establishments']}")
-            print(f"    Match Evidence: {', '.join(thesis['match_evidence'])}")
+            report.extend(format_thesis(thesis, f"Record {i} (Match Score: {thesis['match_score']})"))
+            report.append(f"    Match Evidence: {', '.join(thesis['match_evidence'])}")
+
+    return True, report
+
+async def verify_authors(session, author_ids):
+    """
+    Verifies several authors concurrently, at most CONCURRENCY at a time.
+
+    The blocking HTTP calls run in worker threads sharing the given session.
+
+    Returns:
+        list: The (found, report) tuple of each author, in input order.
+    """
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def verify(author_id):
+        async with semaphore:
+            return await asyncio.to_thread(verify_author, session, author_id)
+
+    return await asyncio.gather(*(verify(author_id) for author_id in author_ids))
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify authors' PhD from France using their OpenAlex IDs.")
+    parser.add_argument("author_id", nargs='+', help="The OpenAlex ID(s) of the author(s) to verify (e.g., A5000002327).")
+    
+    if len(sys.argv) == 1:
+        parser.print_help(sys.stderr)
+        sys.exit(1)
+        
+    args = parser.parse_args()
+    
+    with create_session() as session:
+        results = asyncio.run(verify_authors(session, args.author_id))
+
+    for i, (found, report) in enumerate(results):
+        if i:
+            print("\n" + "=" * 60 + "\n")
+        print("\n".join(report))
+
+    # Fail if any author could not be retrieved
+    if not all(found for found, _ in results):
+        sys.exit(1)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -1,54 +1,72 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import matplotlib.pyplot as plt
 import seaborn as sns
 import sys
 
-def classify_career(sequence):
+# Patterns over a whole ' -> ' separated sequence, entries being stripped of surrounding whitespace
+ALWAYS_FRANCE = r'\s*FR\s*(?:->\s*FR\s*)*'
+# 'US' as one of the comma-separated codes of any entry
+HAD_US = r'(?:^\s*|->\s*|,)US(?:,|\s*->|\s*$)'
+
+def matches(strings, pattern):
+    """Flags the strings matching a regex (RE2 syntax), null strings never matching."""
+    return pc.fill_null(pc.match_substring_regex(strings, pattern), False).to_numpy(zero_copy_only=False)
+
+def has_code(entries, code):
+    """Flags the entries holding the given code among their comma-separated codes."""
+    return matches(entries, rf'(?:^|,)\s*{code}\s*(?:,|$)')
+
+def classify_careers(sequences):
     """
-    Classifies an author's career trajectory based on their country sequence.
+    Classifies authors' career trajectories based on their country sequences.
+
+    The string scans run as Arrow compute kernels over the whole column.
 
     Args:
-        sequence (str): A ' -> ' separated string of country codes.
+        sequences (pd.Series): ' -> ' separated strings of country codes.
 
     Returns:
-        str: The career path category.
+        pd.Series: The career path category of each sequence.
     """
-    if not isinstance(sequence, str):
-        return 'Invalid Sequence'
-
-    countries = [c.strip() for c in sequence.split('->')]
-    
     # This function assumes the first country is 'FR', as filtering is done prior.
-    is_always_france = all(c == 'FR' for c in countries)
-    if is_always_france:
-        return 'Stayed in France'
+    strings = pa.array(sequences, type=pa.string(), from_pandas=True)
+    valid = pc.is_valid(strings).to_numpy(zero_copy_only=False)
+
+    is_always_france = matches(strings, f'^(?:{ALWAYS_FRANCE})$')
 
     # If not always France, they must have left at some point.
-    last_location_raw = countries[-1]
-    last_locations = set(c.strip() for c in last_location_raw.split(','))
-    
-    journey_had_us = any('US' in c.split(',') for c in countries)
-    
-    is_last_only_france = (last_location_raw == 'FR')
+    last_location_raw = pc.utf8_trim_whitespace(pc.replace_substring_regex(strings, '^.*->', ''))
+    journey_had_us = matches(strings, HAD_US)
+    is_last_only_france = pc.fill_null(pc.equal(last_location_raw, 'FR'), False).to_numpy(zero_copy_only=False)
 
-    if is_last_only_france:
-        if journey_had_us:
-            return 'Round-trip (via US)'
-        else:
-            return 'Round-trip (no US)'
-    
     # At this point, they did not return to only-France
-    is_last_in_us = 'US' in last_locations
-    is_last_in_france_too = 'FR' in last_locations
-
-    if is_last_in_us and not is_last_in_france_too:
-        return 'Expatriate (to US)'
-    
-    if not is_last_in_us and not is_last_in_france_too:
-        return 'Expatriate (abroad, no US)'
-
-    # All other cases fall here: e.g., last is 'FR,US' or 'FR,DE'
-    return 'Complex/Ongoing Migration'
+    is_last_in_us = has_code(last_location_raw, 'US')
+    is_last_in_france_too = has_code(last_location_raw, 'FR')
+
+    categories = np.select(
+        [
+            ~valid,
+            is_always_france,
+            is_last_only_france & journey_had_us,
+            is_last_only_france,
+            is_last_in_us & ~is_last_in_france_too,
+            ~is_last_in_us & ~is_last_in_france_too
+        ],
+        [
+            'Invalid Sequence',
+            'Stayed in France',
+            'Round-trip (via US)',
+            'Round-trip (no US)',
+            'Expatriate (to US)',
+            'Expatriate (abroad, no US)'
+        ],
+        # All other cases fall here: e.g., last is 'FR,US' or 'FR,DE'
+        default='Complex/Ongoing Migration'
+    )
+    return pd.Series(categories, index=sequences.index)
 
 def create_migration_visual(input_file, output_image):
     """
@@ -69,10 +87,11 @@ def create_migration_visual(input_file, output_image):
 
     print("Filtering for authors starting in France post-1990...")
     
-    # FIX: The 'min_year' column must be derived from the sequence string,
-    # as it does not exist in the input CSV.
     df.dropna(subset=['publication_years_sequence', 'country_codes_sequence'], inplace=True)
-    df['min_year'] = pd.to_numeric(df['publication_years_sequence'].str.split(' -> ').str[0], errors='coerce')
+    # The 'min_year' column is written by process_authors.py, older outputs
+    # lacking it derive it from the sequence string.
+    if 'min_year' not in df.columns:
+        df['min_year'] = pd.to_numeric(df['publication_years_sequence'].str.split(' -> ').str[0], errors='coerce')
 
     # Now we can safely drop rows where min_year could not be parsed.
     df.dropna(subset=['min_year'], inplace=True)
@@ -80,23 +99,14 @@ def create_migration_visual(input_file, output_image):
 
     df_post_1990 = df[df['min_year'] > 1990].copy()
 
-    df_post_1990['first_country'] = df_post_1990['country_codes_sequence'].str.split(' -> ').str[0]
+    # Only split off the first entry, rather than the whole sequence
+    df_post_1990['first_country'] = df_post_1990['country_codes_sequence'].str.split(' -> ', n=1).str[0]
     fr_starters = df_post_1990[df_post_1990['first_country'] == 'FR'].copy()
     
     if fr_starters.empty:
         print("No authors found matching the criteria (starting in France after 1990).", file=sys.stderr)
         sys.exit(0)
 
-    print(f"Found {len(fr_starters)} authors. Classifying career trajectories per cohort year...")
-    fr_starters['category'] = fr_starters['country_codes_sequence'].apply(classify_career)
-
-    # Create a year-by-year breakdown of categories
-    cohort_trends = fr_starters.groupby('min_year')['category'].value_counts().unstack(fill_value=0)
-    
-    # Calculate the percentage for a 100% stacked area chart
-    cohort_percentages = cohort_trends.div(cohort_trends.sum(axis=1), axis=0) * 100
-    
-    # --- Visualization ---
     # FIX: Explicitly define all categories and colors to ensure none are dropped
     # and the stacking order is logical and consistent.
     
@@ -117,9 +127,19 @@ def create_migration_visual(input_file, output_image):
         '#443a83',  # Indigo for 'Expat abroad'
         '#21908d'   # Teal for 'Complex'
     ]
+
+    print(f"Found {len(fr_starters)} authors. Classifying career trajectories per cohort year...")
+    fr_starters['category'] = pd.Categorical(classify_careers(fr_starters['country_codes_sequence']),
+                                             categories=all_categories, ordered=True)
+
+    # Create a year-by-year breakdown of categories, with one column per
+    # category in the order above, even when never observed
+    cohort_trends = pd.crosstab(fr_starters['min_year'], fr_starters['category'], dropna=False)
     
-    # Reindex the DataFrame to include all categories, filling missing ones with 0
-    cohort_percentages = cohort_percentages.reindex(columns=all_categories, fill_value=0)
+    # Calculate the percentage for a 100% stacked area chart
+    cohort_percentages = cohort_trends.div(cohort_trends.sum(axis=1), axis=0) * 100
+    
+    # --- Visualization ---
 
     print("Generating year-over-year visualization...")
     plt.style.use('seaborn-v0_8-whitegrid')